@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import math
 import os
 import random
 import re
@@ -7,17 +8,17 @@ import time
 import logging
 from datetime import datetime
 import tweepy
-from groq import Groq
+from groq import APIConnectionError, APIError, Groq, InternalServerError, RateLimitError
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-ZODIAC_SIGNS = [
+ZODIAC_SIGNS = (
     "Mesa", "Vrishabha", "Mithuna", "Karkata", "Simha", "Kanya",
     "Tula", "Vrischika", "Dhanu", "Makara", "Kumbha", "Mina",
-]
+)
 
-NEGATIVE_EXAMPLES = [
+NEGATIVE_EXAMPLES = (
     "pretending you don't care is getting exhausting, isn't it?",
     "love isn't dead; it's just ignoring your texts.",
     "You weren't ghosted; you were spiritually redirected.",
@@ -36,13 +37,37 @@ NEGATIVE_EXAMPLES = [
     "your karmic debt looks like your bank balance right now.",
     "don't blame Mercury; blame that 2 a.m. call to your ex.",
     "your aura looks like tangled up wired earphones right now.",
-]
+)
 
-POSITIVE_EXAMPLES = [
+POSITIVE_EXAMPLES = (
     "your overthinking is finally paying off.",
     "someone finally appreciates your intensity.",
     "Your instincts were right all along.",
-]
+)
+
+POSITIVE_PROMPT = (
+    "Write ONE witty, slightly uplifting horoscope for {sign}.\n\n"
+    "Examples:\n{examples}\n\n"
+    "Keep it 10-20 words. Be encouraging but witty.\n"
+    "Do NOT repeat the sign name twice.\n"
+    "Write for {sign}:"
+)
+
+NEGATIVE_PROMPT = (
+    "Write ONE witty, snarky, brutally honest horoscope for {sign}.\n\n"
+    "Examples:\n{examples}\n\n"
+    "Be MEAN and SNARKY. Keep it 15-30 words.\n"
+    "Do NOT repeat the sign name twice.\n"
+    "Write for {sign}:"
+)
+
+SYSTEM_MESSAGES = {
+    "positive": {"role": "system", "content": "You write uplifting horoscopes."},
+    "negative": {"role": "system", "content": "You write brutally honest, snarky horoscopes."},
+}
+
+# Word range a draft-model horoscope must fall in to skip escalation
+MIN_WORDS, MAX_WORDS = 8, 40
 
 
 def get_env(key):
@@ -52,90 +77,136 @@ def get_env(key):
     return val
 
 
+_DASH_TABLE = str.maketrans({'—': ',', '–': ','})
+# Punctuation left dangling at either end once artifacts are removed
+_STRIP_CHARS = ' .,;:-'
+_WS_RE = re.compile(r'\s+')
+_SPACED_DASH_RE = re.compile(r'\s+-\s+')
+_AS_A_RE = re.compile(r',?\s*as a \w+,?\s*', re.IGNORECASE)
+# Leading "Something like:" intro, then a "So,"-style filler, then a bullet dash
+_META_PREFIX_RE = re.compile(
+    r'^(?:(?:A sentence like|Something like|Could be|For example|Like this|Try this|How about):\s*)?'
+    r'(?:(?:So|Could be|For example|Like this|Something like)\b[,:]?\s*)?'
+    r'(?:-\s*)?',
+    re.IGNORECASE,
+)
+_QUOTED_RE = re.compile(r'"([^"]*)"')
+# "Something like this for Mesa: <horoscope>" in a raw completion
+_META_INTRO_LINE_RE = re.compile(r'^(A sentence like|Something like|Could be|For example)[^:]*:\s*(.+)', re.IGNORECASE)
+
+SKIP_KEYWORDS = ('must be', 'should be', 'critical', 'mandatory', 'required',
+                 'strict', 'rule', 'format:', 'example:', 'write for',
+                 'now write', 'the horoscope:', 'message:', 'advice:')
+# Lines that echo prompt instructions rather than the horoscope itself
+_INSTRUCTION_RE = re.compile('|'.join(map(re.escape, SKIP_KEYWORDS)), re.IGNORECASE)
+
+
 def clean_text(text):
     """Remove AI artifacts and meta-commentary."""
-    text = text.replace('—', ',').replace('–', ',')
-    text = re.sub(r'\s+-\s+', ', ', text)
-    text = re.sub(r',?\s*as a \w+,?\s*', ' ', text, flags=re.IGNORECASE)
-    text = re.sub(r'^(A sentence like|Something like|Could be|For example|Like this|Try this|How about):\s*', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'^(So|Could be|For example|Like this|Something like)\b[,:]?\s*', '', text, flags=re.IGNORECASE)
-    text = re.sub(r'^-\s*', '', text)
-    text = re.sub(r'"([^"]*)"', r'\1', text)
-
-    skip_keywords = {'must be', 'should be', 'critical', 'mandatory', 'required',
-                     'strict', 'rule', 'format:', 'example:', 'write for',
-                     'now write', 'the horoscope:', 'message:', 'advice:'}
-    lines = [l.strip() for l in text.split('\n') if l.strip()
-             and not any(kw in l.lower() for kw in skip_keywords)]
-    text = lines[0] if lines else ''
-
-    text = ' '.join(text.split()).strip(' .,;:-')
+    text = text.translate(_DASH_TABLE)
+    if '-' in text:
+        text = _SPACED_DASH_RE.sub(', ', text)
+    text = _AS_A_RE.sub(' ', text)
+    text = _META_PREFIX_RE.sub('', text, count=1)
+    if '"' in text:
+        text = _QUOTED_RE.sub(r'\1', text)
+
+    # Only the first usable line is kept, so stop scanning once it is found
+    text = next((l.strip() for l in text.splitlines() if l.strip()
+                 and not _INSTRUCTION_RE.search(l)), '')
+
+    text = _WS_RE.sub(' ', text).strip(_STRIP_CHARS)
     return text
 
 
 def build_prompt(sign, tone):
     if tone == "positive":
-        examples = '\n'.join(f'- "{sign}, {e}"' for e in random.sample(POSITIVE_EXAMPLES, 3))
-        return (
-            f"Write ONE witty, slightly uplifting horoscope for {sign}.\n\n"
-            f"Examples:\n{examples}\n\n"
-            f"Keep it 10-20 words. Be encouraging but witty.\n"
-            f"Do NOT repeat the sign name twice.\n"
-            f"Write for {sign}:"
-        )
+        template, pool, k = POSITIVE_PROMPT, POSITIVE_EXAMPLES, 3
     else:
-        examples = '\n'.join(f'- "{sign}, {e}"' for e in random.sample(NEGATIVE_EXAMPLES, 6))
-        return (
-            f"Write ONE witty, snarky, brutally honest horoscope for {sign}.\n\n"
-            f"Examples:\n{examples}\n\n"
-            f"Be MEAN and SNARKY. Keep it 15-30 words.\n"
-            f"Do NOT repeat the sign name twice.\n"
-            f"Write for {sign}:"
-        )
+        template, pool, k = NEGATIVE_PROMPT, NEGATIVE_EXAMPLES, 6
+    examples = '\n'.join(f'- "{sign}, {e}"' for e in random.sample(pool, k))
+    return template.format(sign=sign, examples=examples)
+
+
+def retry_delay(error, attempt, cap=60):
+    """Honor the server's Retry-After if it sent one, else back off exponentially with jitter.
+
+    Returns None when the server asks for longer than cap, so the caller gives up instead.
+    """
+    response = getattr(error, 'response', None)
+    if response is not None:
+        try:
+            retry_after = float(response.headers['retry-after'])
+        except (KeyError, ValueError):
+            retry_after = None
+        if retry_after is not None and math.isfinite(retry_after):
+            return max(0.0, retry_after) if retry_after <= cap else None
+    return min(cap, 2 ** attempt) + random.uniform(0, 1)
 
 
 def generate_rashifal(groq_client, model, sign, max_retries=3):
     tone = "positive" if random.random() < 0.1 else "negative"
     prompt = build_prompt(sign, tone)
-    system = f"You write {'uplifting' if tone == 'positive' else 'brutally honest, snarky'} horoscopes."
+    system = SYSTEM_MESSAGES[tone]
 
     for attempt in range(1, max_retries + 1):
         try:
             completion = groq_client.chat.completions.create(
                 model=model,
-                messages=[{"role": "system", "content": system},
-                          {"role": "user", "content": prompt}],
-                max_tokens=80,
+                messages=[system, {"role": "user", "content": prompt}],
+                max_tokens=60,
                 temperature=0.9,
             )
-            raw = completion.choices[0].message.content.strip()
+            choice = completion.choices[0]
+            raw = choice.message.content.strip()
             logger.info(f"Groq attempt {attempt} succeeded. Raw: {raw}")
+            if choice.finish_reason == "length":
+                raise ValueError("Completion cut off at max_tokens")
 
-            match = re.match(r'^(A sentence like|Something like|Could be|For example)[^:]*:\s*(.+)', raw, re.IGNORECASE)
+            match = _META_INTRO_LINE_RE.match(raw)
             text = clean_text(match.group(2) if match else raw)
 
             if not text:
                 raise ValueError("Empty text after cleaning")
-            if not text.endswith(('.', '!', '?')):
-                text = text.rstrip(',') + '.'
+            # clean_text already strips trailing commas, so only the last char matters
+            if text[-1] not in '.!?':
+                text += '.'
 
             logger.info(f"Cleaned: {text} | Tone: {tone}")
             return text
 
-        except Exception as e:
-            err = str(e).lower()
-            if any(x in err for x in ["rate", "429", "limit", "too many"]) and attempt < max_retries:
-                wait = 60 * attempt
-                logger.warning(f"Rate limit, retrying in {wait}s...")
+        except (RateLimitError, APIConnectionError, InternalServerError) as e:
+            wait = retry_delay(e, attempt) if attempt < max_retries else None
+            if wait is not None:
+                logger.warning(f"Groq {type(e).__name__}, retrying in {wait:.1f}s...")
                 time.sleep(wait)
             else:
                 raise
 
 
+def passes_quality_gate(text, sign):
+    """Cheap check that a draft-model horoscope can be posted without escalating."""
+    return MIN_WORDS <= len(text.split()) <= MAX_WORDS and text.count(sign) <= 1
+
+
+def generate_with_draft(groq_client, draft_model, model, sign):
+    """Try the cheaper draft model first and fall back to the main model if its output is unusable."""
+    if draft_model:
+        try:
+            # One attempt only: a throttled draft model should escalate, not back off
+            text = generate_rashifal(groq_client, draft_model, sign, max_retries=1)
+            if passes_quality_gate(text, sign):
+                return text
+            logger.info(f"Draft output failed quality gate, escalating to {model}")
+        except (APIError, ValueError) as e:
+            logger.warning(f"Draft model {draft_model} failed: {e}, escalating to {model}")
+    return generate_rashifal(groq_client, model, sign)
+
+
 def format_tweet(text, sign):
-    text = clean_text(text)
+    # text comes from generate_rashifal, which has already run clean_text
     if not text.startswith(sign):
-        text = f"{sign}, {text[0].upper() + text[1:]}"
+        text = f"{sign}, {text[:1].upper()}{text[1:]}"
     return text[:277] + "..." if len(text) > 280 else text
 
 
@@ -151,6 +222,9 @@ def post_tweet(twitter_client, twitter_v1, use_v1, tweet_text, max_retries=3):
             logger.info(f"Posted: {tweet_text} | ID: {tweet_id} | {len(tweet_text)}/280 chars")
             return True
 
+        except tweepy.errors.Unauthorized as e:
+            logger.error(f"Unauthorized (check credentials, or set RASHIFAL_VERIFY=true to probe fallbacks): {e}")
+            return False
         except tweepy.errors.Forbidden as e:
             logger.error(f"Forbidden (check app permissions): {e}")
             return False
@@ -179,8 +253,12 @@ def setup_twitter():
     client_id       = os.environ.get('TWITTER_CLIENT_ID')
     client_secret   = os.environ.get('TWITTER_CLIENT_SECRET')
 
+    # Probing with get_me() costs a round-trip per auth path; bad credentials
+    # surface from create_tweet anyway, so only probe when asked to
+    verify = os.environ.get('RASHIFAL_VERIFY', '').strip().lower() in ('1', 'true', 'yes')
+
     # Try v2 with OAuth 2.0 Client ID/Secret first
-    if client_id and client_secret:
+    if verify and client_id and client_secret:
         try:
             client = tweepy.Client(
                 bearer_token=bearer_token,
@@ -197,15 +275,18 @@ def setup_twitter():
             logger.warning(f"Twitter v2 OAuth2 failed: {e}, trying consumer keys...")
 
     # Fall back to v2 with consumer key/secret
+    client = tweepy.Client(
+        bearer_token=bearer_token,
+        consumer_key=consumer_key,
+        consumer_secret=consumer_secret,
+        access_token=access_token,
+        access_token_secret=access_secret,
+        wait_on_rate_limit=True,
+    )
+    if not verify:
+        logger.info("Twitter v2 client ready (credentials not verified)")
+        return client, None, False
     try:
-        client = tweepy.Client(
-            bearer_token=bearer_token,
-            consumer_key=consumer_key,
-            consumer_secret=consumer_secret,
-            access_token=access_token,
-            access_token_secret=access_secret,
-            wait_on_rate_limit=True,
-        )
         me = client.get_me()
         logger.info(f"Twitter v2 connected as @{me.data.username}")
         return client, None, False
@@ -223,14 +304,24 @@ def setup_twitter():
 def main():
     logger.info(f"Starting Rashifal Bot — {datetime.now():%Y-%m-%d %H:%M:%S}")
 
-    groq_client = Groq(api_key=get_env('GROQ_KEY'))
+    # generate_rashifal owns the retry schedule; don't stack the SDK's own retries on it
+    groq_client = Groq(api_key=get_env('GROQ_KEY'), max_retries=0)
     model = os.environ.get('GROQ_MODEL', 'llama-3.3-70b-versatile')
+    draft_model = os.environ.get('GROQ_DRAFT_MODEL')
     twitter_client, twitter_v1, use_v1 = setup_twitter()
 
     sign = random.choice(ZODIAC_SIGNS)
     logger.info(f"Sign: {sign}")
 
-    rashifal = generate_rashifal(groq_client, model, sign)
+    # A transient Groq outage skips this run; posting the prompt's own few-shot
+    # examples instead would repeat lines. Auth, bad-model and code errors propagate.
+    try:
+        rashifal = generate_with_draft(groq_client, draft_model, model, sign)
+    except (RateLimitError, APIConnectionError, InternalServerError) as e:
+        logger.error(f"Groq unavailable after retries, skipping this run: {e}")
+        logger.info("FAILED")
+        return 1
+
     tweet_text = format_tweet(rashifal, sign)
 
     success = post_tweet(twitter_client, twitter_v1, use_v1, tweet_text)
@@ -0,0 +1,143 @@
+import types
+
+import httpx
+import pytest
+from groq import APIConnectionError, AuthenticationError, InternalServerError, RateLimitError
+
+import rashifalbot
+
+REQUEST = httpx.Request('POST', 'https://api.groq.com/openai/v1/chat/completions')
+GOOD = "Mesa, your karmic debt looks like your bank balance right now, and the interest is brutal"
+
+
+def status_error(cls, code, headers=None):
+    return cls('error', response=httpx.Response(code, headers=headers or {}, request=REQUEST), body=None)
+
+
+def completion(content, finish_reason="stop"):
+    message = types.SimpleNamespace(content=content)
+    return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason=finish_reason)])
+
+
+class FakeGroq:
+    """Stands in for groq.Groq; replies maps model name to a list of contents or exceptions."""
+
+    def __init__(self, replies):
+        self.replies = {model: list(items) for model, items in replies.items()}
+        self.calls = []
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, model, **kwargs):
+        self.calls.append(model)
+        reply = self.replies[model].pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return completion(reply) if isinstance(reply, str) else completion(*reply)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    monkeypatch.setattr(rashifalbot.time, 'sleep', waits.append)
+    return waits
+
+
+def test_retry_delay_honors_retry_after():
+    assert rashifalbot.retry_delay(status_error(RateLimitError, 429, {'retry-after': '7'}), 1) == 7.0
+    assert rashifalbot.retry_delay(status_error(RateLimitError, 429, {'retry-after': '-1'}), 1) == 0.0
+
+
+def test_retry_delay_over_cap_gives_up():
+    assert rashifalbot.retry_delay(status_error(RateLimitError, 429, {'retry-after': '120'}), 1) is None
+
+
+@pytest.mark.parametrize('header', [None, 'nan', 'inf', 'Wed, 21 Oct 2015 07:28:00 GMT'])
+def test_retry_delay_falls_back_to_backoff(header):
+    headers = {'retry-after': header} if header else {}
+    assert 4 <= rashifalbot.retry_delay(status_error(RateLimitError, 429, headers), 2) <= 5
+    assert 2 <= rashifalbot.retry_delay(APIConnectionError(request=REQUEST), 1) <= 3
+
+
+def test_generate_retries_then_succeeds(sleeps):
+    client = FakeGroq({'main': [status_error(RateLimitError, 429, {'retry-after': '3'}), GOOD]})
+    assert rashifalbot.generate_rashifal(client, 'main', 'Mesa').startswith('Mesa, your karmic debt')
+    assert sleeps == [3.0]
+
+
+def test_generate_over_cap_retry_after_reraises_without_sleeping(sleeps):
+    client = FakeGroq({'main': [status_error(RateLimitError, 429, {'retry-after': '120'}), GOOD]})
+    with pytest.raises(RateLimitError):
+        rashifalbot.generate_rashifal(client, 'main', 'Mesa')
+    assert sleeps == [] and client.calls == ['main']
+
+
+def test_generate_rejects_truncated_completion():
+    client = FakeGroq({'main': [("Mesa, your group chat has started a", "length")]})
+    with pytest.raises(ValueError):
+        rashifalbot.generate_rashifal(client, 'main', 'Mesa')
+
+
+def test_draft_failing_quality_gate_escalates():
+    client = FakeGroq({'draft': ["Mesa, meh."], 'main': [GOOD]})
+    text = rashifalbot.generate_with_draft(client, 'draft', 'main', 'Mesa')
+    assert client.calls == ['draft', 'main']
+    assert text.startswith('Mesa, your karmic debt')
+
+
+def test_draft_passing_quality_gate_is_used():
+    client = FakeGroq({'draft': [GOOD], 'main': []})
+    rashifalbot.generate_with_draft(client, 'draft', 'main', 'Mesa')
+    assert client.calls == ['draft']
+
+
+@pytest.mark.parametrize('draft_reply', [
+    status_error(RateLimitError, 429, {'retry-after': '1'}),
+    status_error(AuthenticationError, 401),
+    "Must be 15-30 words.",
+])
+def test_draft_error_or_empty_output_escalates(sleeps, draft_reply):
+    client = FakeGroq({'draft': [draft_reply], 'main': [GOOD]})
+    rashifalbot.generate_with_draft(client, 'draft', 'main', 'Mesa')
+    assert client.calls == ['draft', 'main']
+    assert sleeps == []
+
+
+def test_draft_code_errors_propagate():
+    client = FakeGroq({'draft': [TypeError('bug')], 'main': [GOOD]})
+    with pytest.raises(TypeError):
+        rashifalbot.generate_with_draft(client, 'draft', 'main', 'Mesa')
+
+
+@pytest.fixture
+def run_main(monkeypatch, sleeps):
+    tweets = []
+    monkeypatch.setenv('GROQ_KEY', 'test')
+    monkeypatch.delenv('GROQ_DRAFT_MODEL', raising=False)
+    monkeypatch.setattr(rashifalbot, 'setup_twitter', lambda: (object(), None, False))
+    monkeypatch.setattr(rashifalbot, 'post_tweet', lambda _c, _v1, _use_v1, text: tweets.append(text) or True)
+
+    def run(replies):
+        client = FakeGroq({'llama-3.3-70b-versatile': replies})
+        monkeypatch.setattr(rashifalbot, 'Groq', lambda **kwargs: client)
+        return rashifalbot.main(), tweets
+    return run
+
+
+def test_main_posts_generated_horoscope(run_main):
+    status, tweets = run_main([GOOD])
+    assert status == 0 and len(tweets) == 1
+
+
+@pytest.mark.parametrize('error', [
+    status_error(RateLimitError, 429),
+    status_error(InternalServerError, 503),
+    APIConnectionError(request=REQUEST),
+])
+def test_main_skips_run_on_transient_outage(run_main, error):
+    status, tweets = run_main([error] * 3)
+    assert status == 1 and tweets == []
+
+
+def test_main_propagates_non_transient_errors(run_main):
+    with pytest.raises(AuthenticationError):
+        run_main([status_error(AuthenticationError, 401)])